@@ -0,0 +1,29 @@
+"""CSSBattle score retriever and OFPPT verifier
+
+The public API is loaded lazily: importing the package does not import
+httpx, Playwright or read any credentials.
+
+    import asyncio
+    import cssbattle_scraper
+
+    statuses = asyncio.run(cssbattle_scraper.verify(["younes123"]))
+"""
+
+__all__ = [
+    "sync",
+    "verify",
+    "resolve_user_ids",
+    "refresh_scores",
+    "refresh_leaderboard",
+    "reclassify",
+    "apply_verdicts",
+    "run_pipeline",
+    "run_daemon",
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from . import api
+        return getattr(api, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
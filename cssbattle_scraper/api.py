@@ -0,0 +1,244 @@
+import asyncio
+import os
+from . import supabasehmm
+from . import user_id_cache
+
+
+# Delta cursor used by sync() (and `sync --delta`) so reading the table
+# never advances the pipeline's own watermark
+LIBRARY_SYNC_STATE_PATH = os.getenv("SYNC_LIBRARY_STATE_PATH", ".cache/sync_state_library.json")
+
+
+# Browser work only imports the scraper (and Playwright) when it is called,
+# so HTTP-only jobs like refresh_scores and sync start without Chromium
+
+
+async def sync(with_score=True, delta=False, state=None):
+    """Read player rows from the database
+
+    With delta=True only rows changed since the last delta sync are
+    returned (plus a periodic full read). Pass a supabasehmm.SyncState to
+    control the cursor yourself: it is left uncommitted, so call commit()
+    and save() once the rows are processed. Without one, a cursor of its
+    own (LIBRARY_SYNC_STATE_PATH) is used and advanced right away; the
+    pipeline's watermark and retries are never touched.
+    """
+    if not delta:
+        return await supabasehmm.get_usernames(WithScore=with_score)
+
+    if state is not None:
+        index, _ = await supabasehmm.sync_players(state, WithScore=with_score)
+        return index.players
+
+    state = supabasehmm.SyncState(LIBRARY_SYNC_STATE_PATH).load()
+    index, _ = await supabasehmm.sync_players(state, WithScore=with_score)
+    state.commit()
+    state.save()
+    return index.players
+
+
+async def _players_by_username(usernames, with_score=False):
+    index = await supabasehmm.get_player_index(WithScore=with_score)
+    if usernames is None:
+        return {p['username']: p for p in index.players}
+    # Any spelling of a username (or a profile link) maps to its canonical entry
+    players = {}
+    for username in usernames:
+        player = index.get(username) or {'username': username}
+        players[player['username']] = player
+    return players
+
+
+async def verify(usernames=None, update=True, concurrency=8):
+    """Check OFPPT status for the given usernames (default: every player)
+
+    Returns {username: True | False | None}; None means the scrape failed.
+    With update=True, statuses that differ from the database are written.
+    """
+    from .scraper import launch_browser, check_ofppt
+    from .snapshots import SnapshotStore
+
+    players = await _players_by_username(usernames)
+    id_cache = user_id_cache.UserIdCache().load()
+    snapshots = SnapshotStore()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with launch_browser() as pool:
+        usernames = list(players)
+        statuses = await asyncio.gather(
+            *[check_ofppt(pool, semaphore, u, id_cache, snapshots) for u in usernames],
+            return_exceptions=True)
+
+    results = {}
+    writes = supabasehmm.UpdateCoalescer(window=None)
+    for username, status in zip(usernames, statuses):
+        if isinstance(status, Exception):
+            status = None
+        results[username] = status
+        current = players[username].get('verified_ofppt', False)
+        if update and status is not None and status != current:
+            writes.update(username, verified_ofppt=status)
+    await writes.flush()
+
+    id_cache.save()
+    snapshots.flush()
+    return results
+
+
+async def resolve_user_ids(usernames=None, update=True, concurrency=8):
+    """Find CSSBattle userIds for the given usernames
+
+    Defaults to verified players without api_user_css. Cached ids are used
+    without opening the browser. Returns {username: userId | None}.
+    """
+    if usernames is None:
+        players = {p['username']: p for p in await supabasehmm.get_api_candidates()}
+    else:
+        players = await _players_by_username(usernames)
+
+    id_cache = user_id_cache.UserIdCache().load()
+    results = {u: id_cache.get(u) for u in players}
+    lookups = [u for u, user_id in results.items()
+               if not user_id and id_cache.should_lookup(u)]
+
+    if lookups:
+        from .scraper import launch_browser, resolve_user_id
+
+        semaphore = asyncio.Semaphore(concurrency)
+        async with launch_browser() as pool:
+            found = await asyncio.gather(
+                *[resolve_user_id(pool, semaphore, u, id_cache) for u in lookups],
+                return_exceptions=True)
+        for username, user_id in zip(lookups, found):
+            results[username] = None if isinstance(user_id, Exception) else user_id
+
+    if update:
+        writes = supabasehmm.UpdateCoalescer(window=None)
+        writes.remember(players.values())
+        for username, user_id in results.items():
+            if user_id:
+                writes.update(username, api_user_css=user_id_cache.api_endpoint_for(user_id))
+        await writes.flush()
+
+    id_cache.save()
+    return results
+
+
+async def refresh_scores(usernames=None, update=True, concurrency=10):
+    """Fetch current scores from each player's getRank endpoint (no browser)
+
+    Defaults to every verified player with api_user_css.
+    Returns {username: score | None}.
+    """
+    players = await _players_by_username(usernames, with_score=True)
+    players = {u: p for u, p in players.items()
+               if p.get('api_user_css') and (usernames is not None or p.get('verified_ofppt'))}
+    semaphore = asyncio.Semaphore(concurrency)
+    writes = supabasehmm.UpdateCoalescer(concurrency=concurrency)
+    writes.remember(players.values())
+
+    async def refresh(username):
+        player = players[username]
+        async with semaphore:
+            score = await supabasehmm.fetch_score(player['api_user_css'])
+        if update and score is not None:
+            writes.update(username, score=score)
+        return score
+
+    usernames = list(players)
+    scores = await asyncio.gather(*[refresh(u) for u in usernames],
+                                  return_exceptions=True)
+    await writes.close()
+    return {u: None if isinstance(s, Exception) else s
+            for u, s in zip(usernames, scores)}
+
+
+def reclassify(path=None):
+    """Re-run the OFPPT rules over the newest snapshot of every player
+
+    Works entirely from the local snapshot store, no network. Returns
+    {username: (verdict_at_capture, new_verdict)} for verdicts that changed.
+    """
+    from .classifier import classify_ofppt
+    from .snapshots import SnapshotStore
+
+    store = SnapshotStore(path) if path else SnapshotStore()
+    changes = {}
+    for username, record in store.latest().items():
+        verdict = classify_ofppt(record)
+        if verdict != record.get("v"):
+            changes[username] = (record.get("v"), verdict)
+    return changes
+
+
+async def apply_verdicts(changes, path=None):
+    """Write re-classified verdicts to the database
+
+    Only verdicts that differ from the stored value are written, to every
+    row of the player's profile. Verdicts the database already holds, and
+    successful writes, are recorded back into the snapshot store so the
+    same change isn't reported again. Returns the usernames written.
+    """
+    from .snapshots import SnapshotStore
+
+    store = SnapshotStore(path) if path else SnapshotStore()
+    latest = store.latest()
+    # Reading the table registers every link variant of each profile, so
+    # writes reach all of its rows
+    index = await supabasehmm.get_player_index()
+    writes = supabasehmm.UpdateCoalescer(window=None)
+    writes.remember(index.players)
+
+    applied = {}
+    queued = {}
+    for username, (_, verdict) in changes.items():
+        player = index.get(username)
+        if player is None:
+            continue
+        if player.get('verified_ofppt', False) == verdict:
+            applied[username] = verdict
+        else:
+            queued[username] = (verdict, writes.update(player['username'], verified_ofppt=verdict))
+    await writes.flush()
+
+    written = []
+    for username, (verdict, future) in queued.items():
+        if future.result().get('status') == 'updated':
+            written.append(username)
+            applied[username] = verdict
+
+    for username, verdict in applied.items():
+        record = latest.get(username)
+        if record is not None:
+            snapshot = {k: v for k, v in record.items() if k not in ("u", "t", "v")}
+            store.append(username, snapshot, verdict, captured_at=record.get("t"))
+    store.flush()
+    return written
+
+
+async def refresh_leaderboard(update=True, top=0):
+    """Recompute ranks of verified players and write only the rows that moved
+
+    Returns ({username: (stored_rank, new_rank)}, [(rank, username, score)]
+    for the top entries).
+    """
+    from .leaderboard import Leaderboard
+
+    board = Leaderboard()
+    board.sync(await supabasehmm.get_usernames(WithScore=True, WithRank=True))
+    changes = await board.flush() if update else board.rank_changes()
+    return changes, board.top(top)
+
+
+async def run_pipeline(delta=False):
+    """Run the full five-step cron pipeline"""
+    from .pipeline import main
+
+    await main(delta)
+
+
+async def run_daemon():
+    """Run the resident scraper until SIGTERM/SIGINT"""
+    from .daemon import ScraperDaemon
+
+    await ScraperDaemon().run()
@@ -0,0 +1,290 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+
+# Recycle Chromium when its processes use more than this much memory
+MAX_RSS_MB = float(os.getenv("BROWSER_MAX_RSS_MB", "1500"))
+# ... or after this many player contexts, whichever comes first
+RECYCLE_AFTER = int(os.getenv("BROWSER_RECYCLE_AFTER", "400"))
+# How often the watchdog samples memory and looks for leaked contexts
+CHECK_INTERVAL = float(os.getenv("BROWSER_CHECK_INTERVAL", "15"))
+# A relaunch is tried this many times, waiting 2 s, 4 s, ... in between
+LAUNCH_ATTEMPTS = int(os.getenv("BROWSER_LAUNCH_ATTEMPTS", "3"))
+LAUNCH_BACKOFF = 2.0
+# After a relaunch has failed, leases fail fast for this long before
+# another relaunch is tried
+LAUNCH_RETRY_AFTER = float(os.getenv("BROWSER_LAUNCH_RETRY_AFTER", "60"))
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def browser_rss_mb(root_pid=None):
+    """Approximate RSS of the Chromium processes started by this process
+
+    Walks /proc for descendants of root_pid (default: ourselves) whose name
+    looks like Chromium and sums their resident memory. Shared pages are
+    counted once per process, so this over-estimates a little. Returns
+    None where /proc is not available.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+
+    children = {}
+    names = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The process name is in parentheses and may itself contain spaces
+        close = stat.rfind(")")
+        pid = int(entry)
+        names[pid] = stat[stat.find("(") + 1:close].lower()
+        ppid = int(stat[close + 2:].split()[1])
+        children.setdefault(ppid, []).append(pid)
+
+    total_kb = 0
+    stack = [root_pid or os.getpid()]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            stack.append(child)
+            if "chrom" in names[child] or "headless" in names[child]:
+                total_kb += _rss_kb(child)
+    return total_kb / 1024
+
+
+class BrowserPool:
+    """One Chromium instance handing out fresh per-player contexts
+
+    A watchdog task samples browser memory and open contexts/pages. When
+    memory or the number of contexts served passes its threshold, new
+    leases wait while in-flight pages finish, then the browser is closed
+    and relaunched. Contexts that are open but not leased are reported as
+    leaks and closed. If Chromium can't be relaunched, waiting leases get
+    the launch error instead of waiting forever.
+    """
+
+    def __init__(self, headless=True, max_rss_mb=MAX_RSS_MB,
+                 recycle_after=RECYCLE_AFTER, check_interval=CHECK_INTERVAL):
+        self.headless = headless
+        self.max_rss_mb = max_rss_mb
+        self.recycle_after = recycle_after
+        self.check_interval = check_interval
+        self.browser = None
+        self._playwright = None
+        self._leases = 0
+        self._active = set()        # contexts currently handed out
+        self._suspects = set()      # unowned contexts seen on the last check
+        self._served = 0            # contexts created since the last launch
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._ready = asyncio.Event()
+        self._recycle_reason = None
+        self._recycle_task = None
+        self._watchdog_task = None
+        self._launch_error = None
+        self._launch_failed_at = 0
+        self.stats = {
+            "launches": 0,
+            "launch_failures": 0,
+            "recycles": 0,
+            "contexts_served": 0,
+            "leaked_contexts": 0,
+            "leaked_pages": 0,
+            "open_contexts": 0,
+            "open_pages": 0,
+            "rss_mb": None,
+            "peak_rss_mb": 0
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        await self._launch()
+        self._watchdog_task = asyncio.create_task(self._watch())
+        return self
+
+    async def _launch(self):
+        self.browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._served = 0
+        self._suspects.clear()
+        self.stats["launches"] += 1
+        self._ready.set()
+
+    async def close(self):
+        if self._watchdog_task is not None:
+            self._watchdog_task.cancel()
+            try:
+                await self._watchdog_task
+            except asyncio.CancelledError:
+                pass
+            self._watchdog_task = None
+        if self._recycle_task is not None:
+            await asyncio.gather(self._recycle_task, return_exceptions=True)
+            self._recycle_task = None
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        self.report()
+
+    def report(self):
+        stats = self.stats
+        if stats["recycles"] or stats["leaked_contexts"]:
+            peak = f", peak RSS {stats['peak_rss_mb']:.0f} MB" if stats["peak_rss_mb"] else ""
+            print(f"  [WATCHDOG] {stats['recycles']} browser recycles, "
+                  f"{stats['leaked_contexts']} leaked contexts "
+                  f"({stats['leaked_pages']} pages) closed{peak}")
+
+    # ------------------------------------------------------------------
+    # Leasing
+    # ------------------------------------------------------------------
+
+    @asynccontextmanager
+    async def page(self):
+        """Yield a page in a fresh context; the context is always closed"""
+        while True:
+            await self._ready.wait()
+            if self.browser is not None and self.browser.is_connected():
+                break
+            if (self._launch_error is not None and
+                    time.monotonic() - self._launch_failed_at < LAUNCH_RETRY_AFTER):
+                raise RuntimeError(f"Browser relaunch failed: {self._launch_error}")
+            self.request_recycle("browser disconnected")
+
+        # Counted before any await so a recycle can't start under us
+        self._leases += 1
+        self._idle.clear()
+        context = None
+        try:
+            # Create a new context with no cache/storage for each player to ensure fresh data
+            context = await self.browser.new_context(
+                ignore_https_errors=True,
+                bypass_csp=True
+            )
+            self._active.add(context)
+            self._served += 1
+            self.stats["contexts_served"] += 1
+
+            # Clear all storage and cache for this context
+            await context.clear_cookies()
+
+            # Closing the context closes its page(s) too, even if the caller
+            # raised before reaching its own cleanup
+            yield await context.new_page()
+        finally:
+            if context is not None:
+                self._active.discard(context)
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            self._leases -= 1
+            if self._leases == 0:
+                self._idle.set()
+            if self._served >= self.recycle_after:
+                self.request_recycle(f"{self._served} contexts served")
+
+    # ------------------------------------------------------------------
+    # Watchdog
+    # ------------------------------------------------------------------
+
+    def request_recycle(self, reason):
+        """Stop handing out pages, drain, then restart the browser"""
+        if self._recycle_reason is not None:
+            return
+        self._recycle_reason = reason
+        self._ready.clear()
+        self._recycle_task = asyncio.create_task(self._recycle())
+
+    async def _recycle(self):
+        try:
+            await self._idle.wait()
+            print(f"  [WATCHDOG] Recycling browser: {self._recycle_reason}")
+            if self.browser is not None:
+                try:
+                    await self.browser.close()
+                except Exception:
+                    pass
+                self.browser = None
+            for attempt in range(LAUNCH_ATTEMPTS):
+                try:
+                    await self._launch()
+                    self._launch_error = None
+                    self.stats["recycles"] += 1
+                    break
+                except Exception as e:
+                    self._launch_error = e
+                    self._launch_failed_at = time.monotonic()
+                    self.stats["launch_failures"] += 1
+                    print(f"  [WATCHDOG] Browser launch failed "
+                          f"({attempt + 1}/{LAUNCH_ATTEMPTS}): {str(e)[:60]}")
+                    if attempt < LAUNCH_ATTEMPTS - 1:
+                        await asyncio.sleep(LAUNCH_BACKOFF * 2 ** attempt)
+        finally:
+            self._recycle_reason = None
+            # Wake waiting leases either way: they get a page or the error
+            self._ready.set()
+
+    async def check(self):
+        """Sample memory, count contexts/pages and close leaked contexts"""
+        if self.browser is None or not self.browser.is_connected():
+            return
+
+        contexts = list(self.browser.contexts)
+        self.stats["open_contexts"] = len(contexts)
+        self.stats["open_pages"] = sum(len(c.pages) for c in contexts)
+
+        # A context can exist briefly before page() registers it, so only
+        # contexts unowned on two checks in a row count as leaked
+        unowned = {c for c in contexts if c not in self._active}
+        for context in unowned & self._suspects:
+            urls = [p.url for p in context.pages]
+            print(f"  [WATCHDOG] Closing leaked context with {len(urls)} pages: "
+                  f"{', '.join(urls)[:100]}")
+            self.stats["leaked_contexts"] += 1
+            self.stats["leaked_pages"] += len(urls)
+            try:
+                await context.close()
+            except Exception:
+                pass
+        self._suspects = unowned - self._suspects
+
+        rss = browser_rss_mb()
+        if rss is not None:
+            self.stats["rss_mb"] = round(rss, 1)
+            self.stats["peak_rss_mb"] = max(self.stats["peak_rss_mb"], round(rss, 1))
+            if rss > self.max_rss_mb:
+                self.request_recycle(f"RSS {rss:.0f} MB > {self.max_rss_mb:.0f} MB")
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                print(f"  [WATCHDOG] Check failed: {str(e)[:60]}")
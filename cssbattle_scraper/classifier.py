@@ -0,0 +1,189 @@
+import re
+
+
+# Pure text rules for OFPPT detection. They run on the text extracted from a
+# profile page (see scraper.extract_profile_text), so the same rules work on
+# a live page and on stored snapshots.
+
+FULL_NAMES = (
+    "OFFICE DE FORMATION PROFESSIONNELLE ET DE PROMOTION DU TRAVAIL",
+    "OFFICE DE FORMATION PROFESSIONNELLE",
+)
+
+RELEVANT_KEYWORDS = ["FORMATION", "EDUCATION", "INSTITUTION",
+                     "ECOLE", "ETABLISSEMENT", "ETUDIANT", "MOROCCO", "MAROC"]
+
+
+def _has_full_name(text_upper):
+    # Full OFPPT name variations are never in usernames
+    return any(name in text_upper for name in FULL_NAMES)
+
+
+def _check_panel(text):
+    """Check one user details panel, excluding OFPPT inside @username"""
+    # IMPORTANT: Exclude username from check (usernames might contain "ofppt")
+    # The username appears as @username, so we need to exclude anything immediately after @
+    text_upper = text.upper()
+
+    # First, check for full OFPPT name variations (these are never in usernames)
+    if _has_full_name(text_upper):
+        return True
+
+    # Now check for "OFPPT" but exclude if it's part of username
+    # Find all @ symbols and their positions
+    at_positions = [i for i, char in enumerate(text_upper) if char == '@']
+
+    # Find all OFPPT occurrences
+    ofppt_positions = []
+    start = 0
+    while True:
+        pos = text_upper.find("OFPPT", start)
+        if pos == -1:
+            break
+        ofppt_positions.append(pos)
+        start = pos + 1
+
+    # Check each OFPPT occurrence
+    for ofppt_pos in ofppt_positions:
+        # Check if this OFPPT is part of a username (immediately after @)
+        is_in_username = False
+        for at_pos in at_positions:
+            # If @ is before OFPPT, check the distance and context
+            if at_pos < ofppt_pos:
+                distance = ofppt_pos - at_pos
+                # Get the text between @ and OFPPT
+                between_text = text_upper[at_pos+1:ofppt_pos]
+
+                # If OFPPT appears after @, check if it's part of a continuous username
+                # A username is typically: @username (no spaces, just alphanumeric/underscore)
+                # If the text between @ and OFPPT has no spaces and is alphanumeric, it's likely username
+                if distance < 50:  # Check up to 50 chars after @
+                    # Check if there are spaces, newlines, or other word delimiters between @ and OFPPT
+                    # If no spaces and all alphanumeric/underscore/hyphen, it's part of username
+                    if ' ' not in between_text and '\n' not in between_text:
+                        # Check if it's all one word (alphanumeric/underscore/hyphen only)
+                        if between_text.replace("_", "").replace("-", "").isalnum():
+                            # This is part of username
+                            is_in_username = True
+                            break
+
+        if not is_in_username:
+            # OFPPT is not in username, it's valid
+            return True
+    return False
+
+
+def _check_main(content_text):
+    """Check the main content area (not entire body to avoid false positives)"""
+    text_upper = content_text.upper()
+    # Check for OFPPT but exclude username patterns
+    # First check for full OFPPT name (always valid)
+    if _has_full_name(text_upper):
+        return True
+
+    # Now check for "OFPPT" as a word
+    for match in re.finditer(r'\bOFPPT\b', text_upper):
+        ofppt_pos = match.start()
+        # Check if it's in a username context
+        # Look for @ before OFPPT
+        before_text = text_upper[max(0, ofppt_pos-50):ofppt_pos]
+        at_pos = before_text.rfind("@")
+
+        if at_pos == -1:
+            # No @ found before, it's valid
+            return True
+
+        # @ found, check distance and context
+        actual_at_pos = ofppt_pos - len(before_text) + at_pos
+        distance = ofppt_pos - actual_at_pos
+        between_text = text_upper[actual_at_pos+1:ofppt_pos]
+
+        # Check if OFPPT is part of username (continuous word after @)
+        # If there are spaces or newlines between @ and OFPPT, it's not in username
+        if distance < 50:
+            if ' ' in between_text or '\n' in between_text:
+                # Has spaces, not in username - it's valid
+                return True
+            elif between_text.replace("_", "").replace("-", "").isalnum():
+                # No spaces, all alphanumeric - it's in username, skip
+                continue
+
+        # If we get here, OFPPT is not in username context
+        return True
+    return False
+
+
+def _check_body(all_page_text):
+    """Last fallback: check entire body text more thoroughly"""
+    text_upper = all_page_text.upper()
+
+    # First check for full OFPPT name variations (always valid)
+    if _has_full_name(text_upper):
+        return True
+
+    # Look for OFPPT as a word boundary (not part of username)
+    for match in re.finditer(r'\bOFPPT\b', text_upper):
+        ofppt_index = match.start()
+        # Check surrounding context (300 chars before and after for better detection)
+        start = max(0, ofppt_index - 300)
+        end = min(len(text_upper), ofppt_index + 300)
+        context = text_upper[start:end]
+
+        # Check if it's in a username context (@username)
+        is_in_username = False
+        # Find all @ symbols in context
+        at_positions_in_context = [
+            i for i, char in enumerate(context) if char == '@']
+        ofppt_pos_in_context = ofppt_index - start
+
+        for at_pos in at_positions_in_context:
+            if at_pos < ofppt_pos_in_context:
+                distance = ofppt_pos_in_context - at_pos
+                between_text = context[at_pos + 1:ofppt_pos_in_context]
+                # If @ is close and no spaces between @ and OFPPT, it's in username
+                if distance < 50 and ' ' not in between_text and '\n' not in between_text:
+                    if between_text.replace("_", "").replace("-", "").isalnum():
+                        is_in_username = True
+                        break
+
+        if not is_in_username:
+            # OFPPT is not in username, check if it's in relevant context
+            if any(keyword in context for keyword in RELEVANT_KEYWORDS):
+                return True
+            # If OFPPT appears with spaces around it (not in username), it's likely valid
+            # Check if there's a space before or after OFPPT in the original text
+            if ofppt_index > 0 and ofppt_index + 5 < len(text_upper):
+                char_before = text_upper[ofppt_index - 1]
+                char_after = text_upper[ofppt_index + 5]
+                delimiters = [' ', '\n', '\t', '.', ',', ':', ';']
+                if char_before in delimiters or char_after in delimiters:
+                    # OFPPT has word boundaries, it's valid
+                    return True
+    return False
+
+
+def classify_ofppt(snapshot):
+    """Decide OFPPT affiliation from extracted profile text
+
+    snapshot is {"exists": bool, "panels": [str], "main": str, "body": str}.
+    Panels are checked first (most reliable), then the main content area,
+    then the whole body.
+    """
+    if snapshot.get("exists") is False:
+        return False
+
+    # Check panels first - this is the most reliable way
+    for text in snapshot.get("panels") or []:
+        if text and _check_panel(text):
+            return True
+
+    main_text = snapshot.get("main") or ""
+    if main_text and _check_main(main_text):
+        return True
+
+    body_text = snapshot.get("body") or ""
+    if len(body_text) > 100 and _check_body(body_text):
+        return True
+
+    # If we got here, OFPPT was not found in the profile
+    return False
@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import sys
+
+
+# Subcommand handlers import what they need when they run, so
+# `refresh-scores` or `sync` never load Playwright
+
+
+async def _with_client(coro):
+    from . import supabasehmm
+
+    try:
+        return await coro
+    finally:
+        await supabasehmm.close_client()
+
+
+def _print_results(title, results, value_header):
+    from .output import print_table, print_summary_box
+
+    print_table(["Username", value_header],
+                [[u, "Error" if v is None else v] for u, v in sorted(results.items())])
+    print_summary_box(title, [
+        ("Total", len(results)),
+        ("Errors", sum(1 for v in results.values() if v is None))
+    ])
+
+
+def cmd_run(args):
+    from .api import run_pipeline
+
+    asyncio.run(run_pipeline(delta=args.delta))
+
+
+def cmd_daemon(args):
+    from .api import run_daemon
+
+    asyncio.run(run_daemon())
+
+
+def cmd_verify(args):
+    from .api import verify
+
+    results = asyncio.run(_with_client(
+        verify(args.usernames or None, update=not args.dry_run)))
+    _print_results("Verify Summary", results, "OFPPT")
+
+
+def cmd_resolve_ids(args):
+    from .api import resolve_user_ids
+
+    results = asyncio.run(_with_client(
+        resolve_user_ids(args.usernames or None, update=not args.dry_run)))
+    _print_results("userId Summary", results, "userId")
+
+
+def cmd_refresh_scores(args):
+    from .api import refresh_scores
+
+    results = asyncio.run(_with_client(
+        refresh_scores(args.usernames or None, update=not args.dry_run)))
+    _print_results("Score Summary", results, "Score")
+
+
+def cmd_leaderboard(args):
+    from .api import refresh_leaderboard
+    from .output import print_table, print_summary_box
+
+    changes, top = asyncio.run(_with_client(
+        refresh_leaderboard(update=not args.dry_run, top=args.top)))
+    print_table(["Rank", "Username", "Score"], top)
+    print_table(["Username", "Old Rank", "New Rank"],
+                [[u, old, new] for u, (old, new) in sorted(
+                    changes.items(), key=lambda c: c[1][1] or 0)])
+    print_summary_box("Leaderboard Summary", [
+        ("Ranks changed", len(changes))
+    ])
+
+
+def cmd_reclassify(args):
+    import json
+    from .api import reclassify, apply_verdicts
+    from .output import print_table, print_summary_box
+
+    changes = reclassify(args.path)
+    print_table(["Username", "Stored verdict", "New verdict"],
+                [[u, old, new] for u, (old, new) in sorted(changes.items())])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({u: new for u, (_, new) in changes.items()}, f, indent=1)
+
+    written = []
+    if args.apply and changes:
+        written = asyncio.run(_with_client(apply_verdicts(changes, args.path)))
+    print_summary_box("Reclassify Summary", [
+        ("Changed verdicts", len(changes)),
+        ("Written to database", len(written))
+    ])
+
+
+def cmd_compact_snapshots(args):
+    from .snapshots import SnapshotStore
+
+    store = SnapshotStore(args.path) if args.path else SnapshotStore()
+    kept = store.compact(keep=args.keep)
+    print(f"  Kept {kept} snapshots in {store.path}")
+
+
+def cmd_sync(args):
+    from .api import sync
+    from .output import print_summary_box
+
+    players = asyncio.run(_with_client(sync(delta=args.delta)))
+    print_summary_box("Database Summary", [
+        ("Total entries", len(players)),
+        ("OFPPT verified", sum(1 for p in players if p.get('verified_ofppt'))),
+        ("With API endpoint", sum(1 for p in players if p.get('api_user_css')))
+    ])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cssbattle_scraper",
+        description="CSSBattle score retriever and OFPPT verifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, help_text in [
+        ("run", cmd_run, "run the full cron pipeline"),
+        ("sync", cmd_sync, "read the players table"),
+    ]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--delta", action="store_true",
+                         help="only read rows changed since the last delta sync")
+        sub.set_defaults(func=func)
+
+    subparsers.add_parser("daemon", help="run as a long-lived service").set_defaults(func=cmd_daemon)
+
+    sub = subparsers.add_parser("reclassify", help="re-run the OFPPT rules on stored snapshots (offline)")
+    sub.add_argument("--path", help="snapshot store (default: SNAPSHOT_PATH)")
+    sub.add_argument("--output", help="write the changed verdicts to this JSON file")
+    sub.add_argument("--apply", action="store_true",
+                     help="write the changed verdicts to the database")
+    sub.set_defaults(func=cmd_reclassify)
+
+    sub = subparsers.add_parser("compact-snapshots", help="keep only the newest snapshots per player")
+    sub.add_argument("--path", help="snapshot store (default: SNAPSHOT_PATH)")
+    sub.add_argument("--keep", type=int, default=1, help="snapshots to keep per player")
+    sub.set_defaults(func=cmd_compact_snapshots)
+
+    sub = subparsers.add_parser("leaderboard", help="recompute and write player ranks (HTTP only)")
+    sub.add_argument("--top", type=int, default=10, help="show the top N players")
+    sub.add_argument("--dry-run", action="store_true",
+                     help="don't write changes to the database")
+    sub.set_defaults(func=cmd_leaderboard)
+
+    for name, func, help_text in [
+        ("verify", cmd_verify, "check OFPPT status (browser)"),
+        ("resolve-ids", cmd_resolve_ids, "find CSSBattle userIds (browser)"),
+        ("refresh-scores", cmd_refresh_scores, "refresh scores from getRank (HTTP only)"),
+    ]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("usernames", nargs="*",
+                         help="usernames to process (default: the usual selection)")
+        sub.add_argument("--dry-run", action="store_true",
+                         help="don't write changes to the database")
+        sub.set_defaults(func=func)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -0,0 +1,369 @@
+import asyncio
+import json
+import os
+import signal
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+from . import supabasehmm
+from . import user_id_cache
+from .browser_pool import BrowserPool
+from .leaderboard import Leaderboard
+from .snapshots import SnapshotStore
+from .output import print_header
+from .scraper import check_ofppt, resolve_user_id
+
+
+# How often the players table is re-read
+CYCLE_INTERVAL = float(os.getenv("DAEMON_CYCLE_INTERVAL", "60"))
+# How often an unchanged player is re-verified for OFPPT
+VERIFY_INTERVAL = float(os.getenv("DAEMON_VERIFY_INTERVAL", str(6 * 60 * 60)))
+# How often a player's score is refreshed from their getRank endpoint
+SCORE_INTERVAL = float(os.getenv("DAEMON_SCORE_INTERVAL", str(15 * 60)))
+# Failed verifications are retried sooner than the normal interval
+RETRY_INTERVAL = float(os.getenv("DAEMON_RETRY_INTERVAL", str(10 * 60)))
+# Upper bound on browser visits per cycle so a cycle (and shutdown) stays short
+BATCH_SIZE = int(os.getenv("DAEMON_BATCH_SIZE", "40"))
+HEALTH_HOST = os.getenv("DAEMON_HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.getenv("DAEMON_HEALTH_PORT", "8080"))
+
+BROWSER_CONCURRENCY = 8
+HTTP_CONCURRENCY = 10
+
+
+class ScraperDaemon:
+    """Resident scraper: warm browser and HTTP pool, continuous scheduling"""
+
+    def __init__(self):
+        self.players = {}        # username -> last row read from the table
+        self.next_verify = {}    # username -> timestamp of next OFPPT check
+        self.next_score = {}     # username -> timestamp of next score refresh
+        self.id_cache = user_id_cache.UserIdCache().load()
+        self.sync_state = supabasehmm.SyncState().load()
+        self.snapshots = SnapshotStore()
+        self.leaderboard = Leaderboard()
+        # Changes made during a cycle go out as one PATCH per player at its end
+        self.writes = supabasehmm.UpdateCoalescer(window=None, concurrency=HTTP_CONCURRENCY)
+        self.queued = []         # (username, row, values before the change, future)
+        self.browser_semaphore = asyncio.Semaphore(BROWSER_CONCURRENCY)
+        self.http_semaphore = asyncio.Semaphore(HTTP_CONCURRENCY)
+        self.stopping = asyncio.Event()
+        self.pool = None
+        self.health_server = None
+        self.started_at = time.time()
+        self.stats = {
+            "cycles": 0,
+            "failed_cycles": 0,
+            "consecutive_failures": 0,
+            "last_cycle_at": None,
+            "last_cycle_ms": None,
+            "last_error": None,
+            "verified": 0,
+            "ids_resolved": 0,
+            "scores_updated": 0,
+            "ranks_updated": 0
+        }
+
+    # ------------------------------------------------------------------
+    # Browser lifecycle
+    # ------------------------------------------------------------------
+
+    async def ensure_browser(self):
+        """Launch Chromium once; the pool relaunches it if it dies or grows too big"""
+        if self.pool is None:
+            self.pool = await BrowserPool().start()
+        return self.pool
+
+    async def stop_browser(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def sync_players(self, rows, full):
+        """Merge a table read and return the usernames whose row changed
+
+        A delta read only contains changed rows; rows are dropped only
+        when a full read no longer contains them.
+        """
+        now = time.time()
+        seen = set()
+        changed = []
+        for row in rows:
+            username = row.get('username')
+            if not username or not username.strip():
+                continue
+            seen.add(username)
+            if self.players.get(username) == row:
+                continue
+            changed.append(username)
+            # New or externally edited rows are checked right away
+            self.next_verify[username] = now
+            self.next_score.setdefault(username, now)
+            self.players[username] = row
+        self.writes.remember(self.players[u] for u in changed)
+
+        for username in list(self.players):
+            if full and username not in seen:
+                del self.players[username]
+                self.next_verify.pop(username, None)
+                self.next_score.pop(username, None)
+        return changed
+
+    def due(self, schedule, now, limit=None):
+        due = sorted((t, u) for u, t in schedule.items() if t <= now)
+        usernames = [u for _, u in due]
+        return usernames[:limit] if limit else usernames
+
+    # ------------------------------------------------------------------
+    # Work
+    # ------------------------------------------------------------------
+
+    async def verify_due(self, now):
+        usernames = self.due(self.next_verify, now, BATCH_SIZE)
+        if not usernames:
+            return
+        pool = await self.ensure_browser()
+
+        async def verify(username):
+            status = await check_ofppt(pool, self.browser_semaphore, username,
+                                       self.id_cache, self.snapshots)
+            row = self.players.get(username)
+            if row is None:
+                return
+            if status is None:
+                self.next_verify[username] = time.time() + RETRY_INTERVAL
+                return
+            self.next_verify[username] = time.time() + VERIFY_INTERVAL
+            self.stats["verified"] += 1
+            if row.get('verified_ofppt', False) != status:
+                self.queue_write(username, verified_ofppt=status)
+
+        await asyncio.gather(*[verify(u) for u in usernames], return_exceptions=True)
+
+    async def resolve_ids(self):
+        candidates = [u for u, row in self.players.items()
+                      if row.get('verified_ofppt') and not row.get('api_user_css')]
+        lookups = [u for u in candidates
+                   if not self.id_cache.get(u) and self.id_cache.should_lookup(u)]
+        lookups = lookups[:BATCH_SIZE]
+
+        async def resolve(username):
+            user_id = self.id_cache.get(username)
+            if not user_id:
+                pool = await self.ensure_browser()
+                user_id = await resolve_user_id(pool, self.browser_semaphore,
+                                                username, self.id_cache)
+            if not user_id:
+                return
+            self.queue_write(username, api_user_css=user_id_cache.api_endpoint_for(user_id))
+            # Due right away: refresh_scores runs later in this cycle
+            self.next_score[username] = time.time()
+
+        cached = [u for u in candidates if self.id_cache.get(u)]
+        await asyncio.gather(*[resolve(u) for u in cached + lookups],
+                             return_exceptions=True)
+
+    async def refresh_scores(self, now):
+        usernames = [u for u in self.due(self.next_score, now)
+                     if self.players[u].get('verified_ofppt')
+                     and self.players[u].get('api_user_css')]
+
+        async def refresh(username):
+            row = self.players[username]
+            async with self.http_semaphore:
+                score = await supabasehmm.fetch_score(row['api_user_css'])
+            self.next_score[username] = time.time() + SCORE_INTERVAL
+            if score is None or score == row.get('score'):
+                return
+            self.queue_write(username, score=score)
+
+        await asyncio.gather(*[refresh(u) for u in usernames], return_exceptions=True)
+
+    def queue_write(self, username, **fields):
+        """Apply a change to the local row now and queue it for the table"""
+        row = self.players[username]
+        previous = {field: row.get(field) for field in fields}
+        row.update(fields)
+        self.queued.append((username, row, previous, self.writes.update(username, **fields)))
+
+    async def flush_writes(self):
+        """Send the cycle's changes and undo the ones that didn't land"""
+        await self.writes.flush()
+        queued, self.queued = self.queued, []
+        now = time.time()
+        failed = []
+        for username, row, previous, future in queued:
+            result = future.result()
+            if result.get('status') != 'updated':
+                failed.append((username, row, previous))
+                continue
+            if 'verified_ofppt' in previous:
+                print(f"  {username}: verified_ofppt -> {row.get('verified_ofppt')}")
+            if 'api_user_css' in previous:
+                self.stats["ids_resolved"] += 1
+                print(f"  ✅ {username}: API saved to DB")
+            if 'score' in previous:
+                self.stats["scores_updated"] += 1
+
+        # Newest first, so a row with several failed changes ends up as stored
+        for username, row, previous in reversed(failed):
+            print(f"  ❌ {username}: update of {', '.join(previous)} failed")
+            if self.players.get(username) is not row:
+                continue
+            # The row still holds the stored values, so the work is redone
+            row.update(previous)
+            if 'verified_ofppt' in previous:
+                self.next_verify[username] = now + RETRY_INTERVAL
+            if 'score' in previous:
+                self.next_score[username] = now
+
+    async def update_ranks(self, full):
+        # Unchanged players are no-ops, so only moved ranks get written
+        self.leaderboard.sync(self.players.values())
+        if full:
+            self.leaderboard.retain(self.players)
+        written = await self.leaderboard.flush()
+        for username, (_, new_rank) in written.items():
+            # Keep the local copy equal to the row the next delta will return
+            if username in self.players:
+                self.players[username]['rank'] = new_rank
+        self.stats["ranks_updated"] += len(written)
+
+    async def cycle(self):
+        started = time.perf_counter()
+        # Only rows changed since the last cycle; a restart starts with a full read
+        index, full = await supabasehmm.sync_players(
+            self.sync_state, WithScore=True, WithRank=True, force_full=not self.players)
+        changed = self.sync_players(index.players, full)
+        if changed:
+            print(f"  {len(changed)} new or changed rows{' (full sync)' if full else ''}")
+
+        now = time.time()
+        await self.verify_due(now)
+        await self.resolve_ids()
+        # Scheduled after resolve_ids, so ids resolved just now are scored
+        # in this cycle and their score joins the same PATCH
+        await self.refresh_scores(time.time())
+        await self.flush_writes()
+        await self.update_ranks(full)
+        self.id_cache.save()
+        self.snapshots.flush()
+        self.sync_state.commit()
+        self.sync_state.save()
+
+        self.stats["cycles"] += 1
+        self.stats["consecutive_failures"] = 0
+        self.stats["last_cycle_at"] = time.time()
+        self.stats["last_cycle_ms"] = int((time.perf_counter() - started) * 1000)
+
+    # ------------------------------------------------------------------
+    # Health endpoint
+    # ------------------------------------------------------------------
+
+    def health(self):
+        # Healthy until a few cycles in a row have been missed or failed
+        last = self.stats["last_cycle_at"] or self.started_at
+        healthy = (time.time() - last < CYCLE_INTERVAL * 3 + 300 and
+                   self.stats["consecutive_failures"] < 3)
+        return healthy, {
+            "status": "ok" if healthy else "stale",
+            "uptime_s": int(time.time() - self.started_at),
+            "players": len(self.players),
+            "ranks_stored": supabasehmm.has_rank_column() is not False,
+            "browser": self.pool.stats if self.pool else None,
+            **self.stats
+        }
+
+    def leaderboard_page(self, query):
+        params = parse_qs(query)
+        try:
+            offset = max(0, int(params.get("offset", ["0"])[0]))
+            limit = min(500, max(1, int(params.get("limit", ["50"])[0])))
+        except ValueError:
+            offset, limit = 0, 50
+        return {
+            "total": len(self.leaderboard),
+            "entries": [{"rank": rank, "username": username, "score": score}
+                        for rank, username, score in self.leaderboard.page(offset, limit)]
+        }
+
+    async def handle_health(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            parts = request_line.decode(errors="replace").split()
+            target = urlsplit(parts[1] if len(parts) > 1 else "/")
+            if target.path.rstrip("/") == "/leaderboard":
+                healthy, body = True, self.leaderboard_page(target.query)
+            else:
+                healthy, body = self.health()
+            payload = json.dumps(body).encode()
+            status = "200 OK" if healthy else "503 Service Unavailable"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + payload)
+            await writer.drain()
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+    # ------------------------------------------------------------------
+    # Main loop
+    # ------------------------------------------------------------------
+
+    def request_stop(self):
+        if not self.stopping.is_set():
+            print("  Shutdown requested, finishing current cycle...")
+            self.stopping.set()
+
+    async def run(self):
+        print_header("CSSBattle Scraper - daemon mode", 80)
+        print(f"  Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"  Cycle every {CYCLE_INTERVAL:.0f}s, health on :{HEALTH_PORT}")
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except NotImplementedError:
+                # Windows: fall back to KeyboardInterrupt
+                pass
+
+        self.health_server = await asyncio.start_server(
+            self.handle_health, HEALTH_HOST, HEALTH_PORT)
+        try:
+            await self.ensure_browser()
+            while not self.stopping.is_set():
+                try:
+                    await self.cycle()
+                except Exception as e:
+                    self.stats["failed_cycles"] += 1
+                    self.stats["consecutive_failures"] += 1
+                    self.stats["last_error"] = str(e)[:200]
+                    print(f"  [ERR] Cycle failed: {str(e)[:100]}")
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), timeout=CYCLE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.health_server.close()
+            await self.health_server.wait_closed()
+            try:
+                self.id_cache.save()
+                self.snapshots.flush()
+            except OSError as e:
+                print(f"  [WARN] Could not save local cache: {str(e)[:60]}")
+            try:
+                # Changes left over from a failed cycle
+                await self.flush_writes()
+            except Exception as e:
+                print(f"  [WARN] Could not send pending updates: {str(e)[:60]}")
+            await self.stop_browser()
+            await supabasehmm.close_client()
+            print("  Daemon stopped")
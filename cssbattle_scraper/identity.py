@@ -0,0 +1,98 @@
+import re
+from urllib.parse import unquote
+
+
+PROFILE_PREFIX = "https://cssbattle.dev/player/"
+
+# http or https, optional www, optional trailing slashes, query or fragment
+_PROFILE_LINK = re.compile(
+    r"^(?:https?://)?(?:www\.)?cssbattle\.dev/player/@?([^/?#\s]+)/*(?:[?#].*)?$",
+    re.IGNORECASE)
+_USERNAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# Fields that must agree across duplicate rows; if they don't, the merged
+# value is None so the next write goes to every row
+_MERGED_FIELDS = ("verified_ofppt", "api_user_css", "score", "rank")
+
+
+def parse_profile_link(link):
+    """Return the username in a CSSBattle profile link, or None if it isn't one"""
+    if not link or not isinstance(link, str):
+        return None
+    match = _PROFILE_LINK.match(link.strip())
+    if not match:
+        return None
+    username = unquote(match.group(1))
+    if not _USERNAME.match(username):
+        return None
+    return username
+
+
+def profile_key(username):
+    """Identity of a profile: CSSBattle usernames differing only in case are one player"""
+    return username.lower()
+
+
+def profile_link(username):
+    return f"{PROFILE_PREFIX}{username}"
+
+
+class PlayerIndex:
+    """Player rows grouped by canonical profile, built once per table read
+
+    players holds one merged entry per real profile, with every raw link
+    pointing at it in "links". Rows whose link can't be parsed end up in
+    invalid and are never scraped.
+    """
+
+    def __init__(self, rows):
+        self.players = []
+        self.row_count = 0
+        self.invalid = []        # raw links that are not CSSBattle profiles
+        self.duplicates = {}     # username -> raw links merged into it
+        self._by_key = {}
+
+        groups = {}
+        for row in rows:
+            self.row_count += 1
+            raw_link = row.get('cssbattle_profile') or ''
+            username = parse_profile_link(raw_link)
+            if username is None:
+                self.invalid.append(raw_link)
+                continue
+            groups.setdefault(profile_key(username), []).append((username, row))
+
+        for key, members in groups.items():
+            # Prefer the spelling of a row whose link is already canonical,
+            # then a stable choice so the same table gives the same username
+            username = min(members, key=lambda m: (
+                m[1].get('cssbattle_profile') != profile_link(m[0]), m[0]))[0]
+
+            merged = dict(members[0][1])
+            merged['username'] = username
+            merged['cssbattle_profile'] = profile_link(username)
+            merged['links'] = sorted({m[1].get('cssbattle_profile') for m in members})
+            for field in _MERGED_FIELDS:
+                if field in merged:
+                    values = [m[1].get(field) for m in members]
+                    merged[field] = values[0] if all(v == values[0] for v in values) else None
+
+            if len(members) > 1:
+                self.duplicates[username] = merged['links']
+            self.players.append(merged)
+            self._by_key[key] = merged
+
+    def __len__(self):
+        return len(self.players)
+
+    @property
+    def merged_rows(self):
+        """Rows folded into another row of the same profile"""
+        return self.row_count - len(self.invalid) - len(self.players)
+
+    def get(self, username):
+        """Look a player up by any spelling of their username or profile link"""
+        if not username:
+            return None
+        parsed = parse_profile_link(username)
+        return self._by_key.get(profile_key(parsed or username.strip()))
@@ -0,0 +1,174 @@
+from bisect import bisect_left, bisect_right
+from . import supabasehmm
+
+
+def _neg_score(entry):
+    return entry[0]
+
+
+class Leaderboard:
+    """Verified players kept sorted by score, with ranks maintained incrementally
+
+    Ranks use standard competition ranking: tied scores share a rank and
+    the next rank skips ("1224"). Reads are O(log n) lookups into the
+    sorted list; a score change only re-ranks the players whose scores
+    lie between the old and new value.
+    """
+
+    def __init__(self):
+        self._entries = []    # sorted (-score, username)
+        self._scores = {}     # username -> score
+        self._written = {}    # username -> rank currently stored in the database
+        self._dirty = set()   # usernames whose rank may have changed
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, username):
+        return username in self._scores
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def _rank_for_score(self, score):
+        # 1 + number of players with a strictly higher score
+        return 1 + bisect_left(self._entries, -score, key=_neg_score)
+
+    def rank_of(self, username):
+        score = self._scores.get(username)
+        if score is None:
+            return None
+        return self._rank_for_score(score)
+
+    def score_of(self, username):
+        return self._scores.get(username)
+
+    def page(self, offset=0, limit=50):
+        """Return [(rank, username, score)] for a slice of the leaderboard"""
+        return [(self._rank_for_score(-neg), username, -neg)
+                for neg, username in self._entries[offset:offset + limit]]
+
+    def top(self, n=10):
+        return self.page(0, n)
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def _mark_between(self, low, high):
+        """Mark every player with low <= score <= high as possibly re-ranked"""
+        start = bisect_left(self._entries, -high, key=_neg_score)
+        end = bisect_right(self._entries, -low, key=_neg_score)
+        for _, username in self._entries[start:end]:
+            self._dirty.add(username)
+
+    def _mark_below(self, score):
+        """Mark every player scoring strictly less than score"""
+        start = bisect_right(self._entries, -score, key=_neg_score)
+        for _, username in self._entries[start:]:
+            self._dirty.add(username)
+
+    def set_score(self, username, score):
+        """Insert a player or move them to a new score"""
+        score = score or 0
+        old = self._scores.get(username)
+        if old == score:
+            return
+
+        if old is not None:
+            self._entries.pop(bisect_left(self._entries, (-old, username)))
+        self._scores[username] = score
+        entry = (-score, username)
+        self._entries.insert(bisect_left(self._entries, entry), entry)
+
+        if old is None:
+            # Everyone below the newcomer drops one place
+            self._mark_below(score)
+        else:
+            self._mark_between(min(old, score), max(old, score))
+        self._dirty.add(username)
+
+    def remove(self, username):
+        old = self._scores.pop(username, None)
+        if old is None:
+            return
+        self._entries.pop(bisect_left(self._entries, (-old, username)))
+        # Stays dirty so a stored rank gets cleared
+        self._dirty.add(username)
+        # Everyone below moves up one place
+        self._mark_below(old)
+
+    def sync(self, players):
+        """Apply a list of player rows; only verified players are ranked
+
+        Rows carrying a "rank" value seed what is already stored in the
+        database for players seen for the first time. Returns the set of
+        ranked usernames in the rows.
+        """
+        bulk = not self._scores
+        seen = set()
+        for player in players:
+            username = player.get('username')
+            if not username:
+                continue
+            if username not in self._written and player.get('rank') is not None:
+                self._written[username] = player['rank']
+                self._dirty.add(username)
+            if not player.get('verified_ofppt'):
+                self.remove(username)
+                continue
+            seen.add(username)
+            if bulk:
+                self._scores[username] = player.get('score') or 0
+            else:
+                self.set_score(username, player.get('score'))
+
+        if bulk:
+            # First load: sort once instead of inserting one by one
+            self._entries = sorted((-score, username)
+                                   for username, score in self._scores.items())
+            self._dirty.update(self._scores)
+        return seen
+
+    def retain(self, usernames):
+        """Drop everyone not in usernames (after a full read of the table)"""
+        for username in list(self._scores):
+            if username not in usernames:
+                self.remove(username)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def rank_changes(self):
+        """Return {username: (stored_rank, new_rank)} for ranks that really moved"""
+        changes = {}
+        for username in self._dirty:
+            # None for players no longer ranked, so their stored rank is cleared
+            new_rank = self.rank_of(username)
+            old_rank = self._written.get(username)
+            if old_rank != new_rank:
+                changes[username] = (old_rank, new_rank)
+        return changes
+
+    async def flush(self):
+        """Bulk-write only the rows whose rank changed; returns the changes written"""
+        changes = self.rank_changes()
+        self._dirty.difference_update(
+            u for u in list(self._dirty) if u not in changes)
+        if not changes:
+            return {}
+
+        result = await supabasehmm.update_ranks(
+            {username: new for username, (_, new) in changes.items()})
+        written = {}
+        for username in result.get('updated', []):
+            new_rank = changes[username][1]
+            if new_rank is None:
+                self._written.pop(username, None)
+            else:
+                self._written[username] = new_rank
+            self._dirty.discard(username)
+            written[username] = changes[username]
+        return written
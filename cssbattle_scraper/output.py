@@ -0,0 +1,66 @@
+# ============================================================================
+# OUTPUT FORMATTING FUNCTIONS
+# ============================================================================
+
+def print_header(title, width=80):
+    """Print a formatted header"""
+    print()
+    print("=" * width)
+    print(f"  {title}")
+    print("=" * width)
+
+
+def print_table(headers, rows, width=80):
+    """Print a formatted table"""
+    if not rows:
+        return
+
+    # Calculate column widths
+    col_widths = [len(str(h)) for h in headers]
+    for row in rows:
+        for i, cell in enumerate(row):
+            if i < len(col_widths):
+                col_widths[i] = max(col_widths[i], len(str(cell)))
+
+    # Add padding
+    col_widths = [w + 2 for w in col_widths]
+    total_width = sum(col_widths) + len(headers) - 1
+
+    # Print header
+    header_row = "|".join([str(h).center(w)
+                          for h, w in zip(headers, col_widths)])
+    print("+" + "-" * (total_width - 2) + "+")
+    print("|" + header_row + "|")
+    print("+" + "-" * (total_width - 2) + "+")
+
+    # Print rows
+    for row in rows:
+        row_str = "|".join([str(cell).ljust(w)
+                           for cell, w in zip(row, col_widths)])
+        print("|" + row_str + "|")
+
+    print("+" + "-" * (total_width - 2) + "+")
+    print()
+
+
+def print_summary_box(title, items, width=80):
+    """Print a summary box with key-value pairs"""
+    print("+" + "-" * (width - 2) + "+")
+    print(f"| {title.center(width - 4)} |")
+    print("+" + "-" * (width - 2) + "+")
+    for key, value in items:
+        print(f"| {str(key).ljust(30)} : {str(value).rjust(width - 38)} |")
+    print("+" + "-" * (width - 2) + "+")
+    print()
+
+
+def print_progress_bar(current, total, width=50):
+    """Print a progress bar"""
+    if total == 0:
+        return
+    filled = int(width * current / total)
+    bar = "█" * filled + "░" * (width - filled)
+    percent = (current / total) * 100
+    print(f"  [{bar}] {current}/{total} ({percent:.1f}%)", end='\r')
+    if current == total:
+        print()  # New line when complete
@@ -0,0 +1,413 @@
+import asyncio
+import time
+from datetime import datetime
+import sys
+from . import supabasehmm
+from . import user_id_cache
+from .snapshots import SnapshotStore
+from .output import print_header, print_table, print_summary_box
+from .scraper import launch_browser, check_ofppt, resolve_user_id
+
+
+async def main(delta=False):
+    # Record start time
+    start_time = time.time()
+    start_datetime = datetime.now()
+
+    print_header("CSSBattle User ID Scraper - API Endpoint Generator", 80)
+    print(f"  Started: {start_datetime.strftime('%Y-%m-%d %H:%M:%S')}")
+    print()
+
+    try:
+        await run_main_logic(delta)
+
+        # Calculate execution time
+        end_time = time.time()
+        end_datetime = datetime.now()
+        execution_time = end_time - start_time
+        minutes = int(execution_time // 60)
+        seconds = int(execution_time % 60)
+        milliseconds = int((execution_time % 1) * 1000)
+
+        print()
+        print_summary_box("Execution Summary", [
+            ("Execution Time", f"{minutes}m {seconds}s {milliseconds}ms"),
+            ("Started", start_datetime.strftime('%Y-%m-%d %H:%M:%S')),
+            ("Ended", end_datetime.strftime('%Y-%m-%d %H:%M:%S'))
+        ])
+
+    except Exception as e:
+        # Calculate execution time even on error
+        end_time = time.time()
+        execution_time = end_time - start_time
+        minutes = int(execution_time // 60)
+        seconds = int(execution_time % 60)
+        milliseconds = int((execution_time % 1) * 1000)
+
+        print()
+        print_summary_box("Execution Failed", [
+            ("Error", str(e)[:70]),
+            ("Execution Time", f"{minutes}m {seconds}s {milliseconds}ms")
+        ])
+        sys.exit(1)
+
+
+async def run_main_logic(delta=False):
+    # Persistent username -> userId map shared by every step of the run
+    id_cache = user_id_cache.UserIdCache().load()
+    # Extracted profile text from every visit, for offline re-classification
+    snapshots = SnapshotStore()
+    sync_state = supabasehmm.SyncState().load() if delta else None
+    # One PATCH per player per stage, whichever columns changed
+    writes = supabasehmm.UpdateCoalescer()
+
+    try:
+        # Step 1: Fetch all players from the database
+        if delta:
+            # Only rows changed since the last run, plus a periodic full pass
+            index, full = await supabasehmm.sync_players(sync_state)
+            print_header(
+                f"STEP 1: Fetching {'all' if full else 'changed'} players from database", 80)
+        else:
+            print_header("STEP 1: Fetching all players from database", 80)
+            index = await supabasehmm.get_player_index()
+
+        # One entry per real profile: link variants (http://, trailing
+        # slash, query string, case) are merged so nobody is scraped twice
+        all_players = index.players
+        writes.remember(all_players)
+
+        # Ids that are already stored in the database are known resolutions too
+        for player in all_players:
+            known_id = user_id_cache.user_id_from_url(
+                player.get('api_user_css'))
+            if known_id:
+                id_cache.record_found(player.get('username'), known_id)
+
+        # Filter out empty usernames
+        valid_players = [player for player in all_players if player.get(
+            'username') and player['username'].strip()]
+
+        if index.duplicates:
+            print_table(
+                ["Username", "Merged links"],
+                [[username, ", ".join(links)] for username, links in index.duplicates.items()]
+            )
+
+        # Links that aren't CSSBattle profiles are reported, never scraped
+        if index.invalid:
+            print_table(
+                ["Invalid profile link"],
+                [[link or "(empty)"] for link in index.invalid]
+            )
+
+        print_summary_box("Database Summary", [
+            ("Total entries", index.row_count),
+            ("Valid players", len(valid_players)),
+            ("Duplicate rows merged", index.merged_rows),
+            ("Invalid entries", len(index.invalid))
+        ])
+
+        if not valid_players and not delta:
+            print("  [ERROR] No valid players to process")
+            return
+
+        print(
+            f"  [SUCCESS] Step 1 complete: {len(valid_players)} players ready for verification")
+        print()
+
+        # Step 2: Check each player's profile on the web for OFPPT verification
+        print_header(
+            "STEP 2: Checking OFPPT verification (fresh scrape, no cache)", 80)
+        verified_players = []      # Temporary array for OFPPT verified players
+        unverified_players = []    # Temporary array for players without OFPPT
+        error_players = []         # Players with scraping errors
+
+        semaphore = asyncio.Semaphore(8)  # Reduced concurrency for stability
+
+        print(f"  Processing {len(valid_players)} players...")
+        print()
+
+        if valid_players:
+            async with launch_browser() as pool:
+                async def check_ofppt_verification(player_data):
+                    username = player_data.get('username')
+                    if not username or not username.strip():
+                        return None
+
+                    ofppt_status = await check_ofppt(pool, semaphore, username, id_cache, snapshots)
+                    current_db_status = player_data.get('verified_ofppt', False)
+
+                    if ofppt_status is True:
+                        verified_players.append({
+                            'username': username,
+                            'current_ofppt_status': current_db_status,
+                            'api_user_css': player_data.get('api_user_css')
+                        })
+                    elif ofppt_status is False:
+                        unverified_players.append({
+                            'username': username,
+                            'current_ofppt_status': current_db_status
+                        })
+                    else:
+                        error_players.append({
+                            'username': username,
+                            'current_ofppt_status': current_db_status
+                        })
+
+                    return ofppt_status
+
+                # Check OFPPT verification for all players
+                tasks = [check_ofppt_verification(player)
+                         for player in valid_players]
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Display results in table format
+        print()
+        if verified_players:
+            print_table(
+                ["Username", "Status", "Database Status"],
+                [[p['username'], "OFPPT Verified", "True" if p['current_ofppt_status'] else "False"]
+                 for p in verified_players]
+            )
+
+        if unverified_players:
+            print_table(
+                ["Username", "Status", "Database Status"],
+                [[p['username'], "Not Verified", "True -> False" if p['current_ofppt_status'] else "False (unchanged)"]
+                 for p in unverified_players]
+            )
+
+        if error_players:
+            print_table(
+                ["Username", "Status"],
+                [[p['username'], "Scraping Error"] for p in error_players]
+            )
+
+        print_summary_box("Step 2 Summary", [
+            ("Total processed", len(valid_players)),
+            ("OFPPT verified", len(verified_players)),
+            ("Not verified", len(unverified_players)),
+            ("Errors", len(error_players))
+        ])
+
+        # Step 3: Update database records for OFPPT verification status
+        print_header(
+            "STEP 3: Updating OFPPT verification status in database", 80)
+        ofppt_updates = []
+        update_success = []
+        update_failed = []
+        update_skipped = []
+
+        # Changes are queued per player and sent as one PATCH each when the
+        # stage ends
+        queued = []
+
+        # Update players who should have OFPPT verification = true
+        for player in verified_players:
+            username = player['username']
+            current_db_status = player['current_ofppt_status']
+
+            # Update database status to True
+            if current_db_status != True:  # Only update if different
+                fields = {"verified_ofppt": True}
+                # The userId seen while verifying goes out in the same PATCH
+                # instead of a second one in step 5
+                user_id = id_cache.get(username)
+                if user_id and not player['api_user_css']:
+                    fields["api_user_css"] = user_id_cache.api_endpoint_for(user_id)
+                queued.append((username, "True", writes.update(username, **fields)))
+            else:
+                update_skipped.append((username, "True", "Already correct"))
+
+        # Update players who should have OFPPT verification = false
+        # This is critical: if a player removed OFPPT from their profile, update DB to False
+        for player in unverified_players:
+            username = player['username']
+            current_db_status = player['current_ofppt_status']
+
+            # Update database status to False
+            if current_db_status != False:  # Only update if different
+                queued.append((username, "False", writes.update(username, verified_ofppt=False)))
+            else:
+                update_skipped.append(
+                    (username, "False", "Already correct"))
+
+        await writes.flush()
+        for username, new_status, future in queued:
+            update_result = future.result()
+            if update_result.get('status') == 'updated':
+                ofppt_updates.append(update_result)
+                update_success.append((username, new_status, "Updated + API"
+                                       if update_result.get('api_user_css') else "Updated"))
+            else:
+                update_failed.append((username, new_status, str(
+                    update_result.get('status', 'failed'))[:30]))
+
+        # Display update results in tables
+        if update_success:
+            print_table(
+                ["Username", "New Status", "Result"],
+                update_success
+            )
+
+        if update_failed:
+            print_table(
+                ["Username", "New Status", "Error"],
+                update_failed
+            )
+
+        if update_skipped:
+            print_table(
+                ["Username", "Status", "Reason"],
+                update_skipped
+            )
+
+        print_summary_box("Step 3 Summary", [
+            ("Total updates", len(ofppt_updates)),
+            ("Successful", len(update_success)),
+            ("Failed", len(update_failed)),
+            ("Skipped", len(update_skipped))
+        ])
+
+        # Changed rows are processed, the next delta can start after them.
+        # Failed scrapes and writes are re-read next run instead of waiting
+        # for the next full read.
+        if sync_state is not None:
+            failed = [p['username'] for p in error_players] + [u for u, _, _ in update_failed]
+            deferred = sum(sync_state.defer(index.get(username)) for username in set(failed))
+            if deferred:
+                print(f"  {deferred} failed players will be retried next run")
+            sync_state.commit()
+            sync_state.save()
+
+        # Step 4: Filter players who are OFPPT verified and don't have API value yet
+        print_header(
+            "STEP 4: Filtering OFPPT verified players for API scraping", 80)
+
+        # Get fresh data after updating OFPPT status; the database does the
+        # filtering, so only verified players without an API value are read
+        # (never the whole table)
+        cssbattle_players = [player for player in await supabasehmm.get_api_candidates()
+                             if player.get('cssbattle_profile')]
+        writes.remember(cssbattle_players)
+
+        print_summary_box("API Scraping Candidates", [
+            ("OFPPT verified", len(verified_players)),
+            ("Ready for API scraping", len(cssbattle_players))
+        ])
+
+        if not cssbattle_players:
+            print(
+                "  [SUCCESS] No players need API scraping (all have existing API values or don't meet criteria)")
+            return
+
+        print(
+            f"  [SUCCESS] Step 4 complete: {len(cssbattle_players)} players need API scraping")
+        print()
+
+        # Step 5: Scrape user IDs for OFPPT verified players with CSSBattle profiles
+        print_header(
+            "STEP 5: Scraping userIds for OFPPT verified players", 80)
+
+        success_count = 0
+        error_count = 0
+        skipped_count = 0
+
+        # Browser lookups and database writes run as separate stages: a
+        # lookup hands its userId to the writer and frees its browser slot
+        # right away, the writer batches PATCHes under its own limit
+        saves = []
+
+        def save_api_endpoint(username, user_id):
+            # Generate the API endpoint URL
+            api_endpoint = user_id_cache.api_endpoint_for(user_id)
+            saves.append((username, writes.update(username, api_user_css=api_endpoint)))
+
+        # Split candidates: already resolved ids (earlier run, step 2, or a
+        # failed DB write) only need the DB write; recent misses wait for
+        # their backoff to expire; only the rest need the browser
+        cached_players = []
+        lookup_players = []
+        hopeless_players = []
+        for player in cssbattle_players:
+            username = player.get('username')
+            if not username or not username.strip():
+                continue
+            if id_cache.get(username):
+                cached_players.append(player)
+                continue
+            if id_cache.is_hopeless(username):
+                # Still looked up, but only once the maximum backoff expires
+                hopeless_players.append(username)
+            if id_cache.should_lookup(username):
+                lookup_players.append(player)
+            else:
+                skipped_count += 1
+
+        if hopeless_players:
+            print_table(
+                ["Username", "Failed lookups", "Last error"],
+                [[u, id_cache.entries[u].get("failures", 0),
+                  (id_cache.entries[u].get("reason") or "-")[:40]]
+                 for u in hopeless_players]
+            )
+
+        if cached_players:
+            print(f"  {len(cached_players)} userIds resolved from cache")
+            for player in cached_players:
+                save_api_endpoint(player['username'], id_cache.get(player['username']))
+
+        if lookup_players:
+            async with launch_browser() as pool:
+                async def scrape_user_id(player_data):
+                    username = player_data.get('username')
+                    user_id = await resolve_user_id(pool, semaphore, username, id_cache)
+                    if user_id:
+                        save_api_endpoint(username, user_id)
+                    return user_id
+
+                # Scrape user IDs for all players
+                tasks = [scrape_user_id(player) for player in lookup_players]
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                error_count += sum(1 for result in results
+                                   if isinstance(result, Exception) or not result)
+
+        # Wait for the writer to finish with whatever is still queued
+        await writes.flush()
+        for username, future in saves:
+            update_result = future.result()
+            if update_result.get('status') == 'updated':
+                print(f"  ✅ {username}: API saved to DB")
+                success_count += 1
+            else:
+                print(f"  ❌ {username}: DB update failed - "
+                      f"{str(update_result.get('response', update_result.get('message', '')))[:50]}")
+                error_count += 1
+
+        # Display results in table format
+        print()
+        print_summary_box("Step 5 Summary", [
+            ("Total processed", len(cssbattle_players)),
+            ("Successful", success_count),
+            ("Failed", error_count),
+            ("Skipped", skipped_count),
+            ("Hopeless (weekly retry)", len(hopeless_players))
+        ])
+
+        print_header("All steps completed successfully!", 80)
+
+    except Exception as e:
+        print(f"Error in main logic: {str(e)[:100]}...")
+    finally:
+        try:
+            id_cache.save()
+            snapshots.flush()
+        except OSError as e:
+            print(f"  [WARN] Could not save local cache: {str(e)[:60]}")
+        try:
+            await writes.close()
+        except Exception as e:
+            print(f"  [WARN] Could not send pending updates: {str(e)[:60]}")
+        await supabasehmm.close_client()
+
@@ -0,0 +1,270 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from . import user_id_cache
+from .classifier import classify_ofppt
+
+
+@asynccontextmanager
+async def launch_browser(headless=True):
+    """Start a watched Chromium pool for the duration of the block (Playwright is imported lazily)"""
+    from .browser_pool import BrowserPool
+
+    pool = await BrowserPool(headless=headless).start()
+    try:
+        yield pool
+    finally:
+        await pool.close()
+
+
+async def verify_url(page):
+    try:
+        # Reduced timeout for faster failure detection
+        await page.wait_for_load_state("domcontentloaded", timeout=5000)
+        # Reduced wait time
+        await page.wait_for_timeout(300)
+
+        panel = await page.query_selector(
+            "[style*='text-align:center;min-height:calc(100vh - 15rem);display:grid;place-content:center']"
+        )
+
+        # If panel exists, user profile does NOT exist
+        # If panel does not exist, user profile DOES exist
+        if panel:
+            return False  # User profile does not exist
+        return True  # User profile exists
+
+    except Exception as e:
+        return False
+
+
+async def extract_profile_text(page):
+    """Pull the text the OFPPT rules look at out of a loaded profile page
+
+    Returns {"exists": True, "panels": [...], "main": str, "body": str},
+    or None if the page could not be read at all.
+    """
+    try:
+        # Wait for page to be fully loaded
+        await page.wait_for_timeout(2000)
+
+        # First, get ALL text from the page to check comprehensively
+        all_page_text = ""
+        try:
+            all_page_text = await page.inner_text("body")
+        except:
+            pass
+
+        # Try to find user details panels (this is the main profile content area)
+        panels = []
+        try:
+            # Wait for selector with a reasonable timeout
+            await page.wait_for_selector(".user-details__main", timeout=5000)
+            panels = await page.query_selector_all(".user-details__main")
+        except:
+            # Selector not found or timeout - try alternative selectors
+            try:
+                # Try other possible selectors for user profile content
+                panels = await page.query_selector_all("[class*='user'], [class*='profile'], [class*='bio'], [class*='info'], [class*='about']")
+            except:
+                pass
+
+        panel_texts = []
+        for panel in panels or []:
+            try:
+                text = (await panel.text_content()).strip()
+                if text:
+                    panel_texts.append(text)
+            except:
+                continue
+
+        # Main content area (not entire body to avoid false positives)
+        main_text = ""
+        try:
+            main_content = await page.query_selector("main, [role='main'], .profile, .user-profile")
+            if main_content:
+                main_text = await main_content.inner_text() or ""
+        except:
+            pass
+
+        return {
+            "exists": True,
+            "panels": panel_texts,
+            "main": main_text,
+            "body": all_page_text or ""
+        }
+
+    except Exception as e:
+        return None
+
+
+# verify if he is in OFPPT
+async def verify_ofppt(page):
+    """Check if user profile contains OFPPT information with username exclusion"""
+    snapshot = await extract_profile_text(page)
+    if snapshot is None:
+        # Return None to indicate error occurred
+        return None
+    return classify_ofppt(snapshot)
+
+
+async def find_user_id(page, username):
+    """Find userId for a username by intercepting API calls and checking page content"""
+    print(f"Finding userId for: {username}")
+
+    user_id = None
+    found = asyncio.Event()
+
+    def on_response(response):
+        nonlocal user_id
+        url = response.url
+        if 'getRank' in url and 'userId=' in url:
+            # Extract userId from API call
+            user_id = user_id_cache.user_id_from_url(url)
+            print(f"  Found in API call: {user_id}")
+            if user_id:
+                found.set()
+
+    page.on('response', on_response)
+
+    # Navigate to the user profile
+    try:
+        await page.goto(f"https://cssbattle.dev/player/{username}", timeout=20000)
+        # Wait for API calls to happen, but give the page back as soon as
+        # the getRank call has been seen
+        try:
+            await asyncio.wait_for(found.wait(), timeout=3)
+        except asyncio.TimeoutError:
+            pass
+
+        # If not found in API calls, try to find in page content
+        if not user_id:
+            # Look for userId in the page content
+            user_id = await page.evaluate('''() => {
+                // Look for userId in the page
+                const regex = /userId=([a-zA-Z0-9]{20,30})/g;
+                const html = document.documentElement.outerHTML;
+                const match = regex.exec(html);
+                return match ? match[1] : null;
+            }''')
+
+            if user_id:
+                print(f"  Found in page content: {user_id}")
+
+    except Exception as e:
+        # Not a miss: the profile was never read, let the caller back off
+        print(f"  Error navigating to {username}: {str(e)}")
+        raise
+
+    return user_id
+
+
+async def verify_ofppt_for_player(page, username, snapshots=None):
+    # Retry logic for OFPPT verification with fresh scraping
+    max_retries = 3
+    target_url = f"https://cssbattle.dev/player/{username}"
+
+    async def read_verdict():
+        snapshot = await extract_profile_text(page)
+        if snapshot is None:
+            return None
+        verdict = classify_ofppt(snapshot)
+        # Keep what was read so the rules can be re-run offline later
+        if snapshots is not None:
+            snapshots.append(username, snapshot, verdict)
+        return verdict
+
+    for attempt in range(max_retries):
+        try:
+            # Add cache-busting query parameter to ensure fresh fetch
+            cache_buster = int(time.time() * 1000)
+            fresh_url = f"{target_url}?_t={cache_buster}"
+
+            # Navigate to the profile URL with fresh request (no cache)
+            await page.goto(
+                fresh_url,
+                wait_until="domcontentloaded",
+                timeout=20000
+            )
+
+            # Wait for page to be fully loaded
+            try:
+                await page.wait_for_load_state("networkidle", timeout=10000)
+            except:
+                # If networkidle times out, that's okay, continue with domcontentloaded
+                pass
+            await page.wait_for_timeout(1500)
+
+            userExists = await verify_url(page)
+            if not userExists:
+                print(f"  {username}: Profile does not exist")
+                if snapshots is not None:
+                    snapshots.append(username, {"exists": False}, False)
+                return False
+
+            # Check OFPPT status with better error handling
+            ofppt_status = await read_verdict()
+
+            if ofppt_status is None:
+                # If verify_ofppt returned None, it means there was an error
+                # Try one more time with a longer wait
+                if attempt < max_retries - 1:
+                    await page.wait_for_timeout(2000)
+                    ofppt_status = await read_verdict()
+                    if ofppt_status is not None:
+                        return ofppt_status
+                raise Exception(
+                    "Failed to determine OFPPT status after retries")
+
+            return ofppt_status
+        except Exception as e:
+            if attempt < max_retries - 1:
+                # Silent retry - don't print unless it's the last attempt
+                await asyncio.sleep(2)  # Wait before retry
+            else:
+                # Only print error on final failure
+                return None
+
+
+async def check_ofppt(pool, semaphore, username, id_cache=None, snapshots=None):
+    """Verify one player's OFPPT status in a fresh browser context"""
+    async with semaphore:
+        async with pool.page() as page:
+            # The profile page calls getRank?userId=... on load, so the
+            # userId comes for free while we are verifying
+            if id_cache is not None:
+                def on_response(response):
+                    if 'getRank' in response.url:
+                        id_cache.record_found(
+                            username, user_id_cache.user_id_from_url(response.url))
+
+                page.on('response', on_response)
+            try:
+                return await verify_ofppt_for_player(page, username, snapshots)
+            except Exception as e:
+                print(f"  [ERR] {username}: Error - {str(e)[:50]}...")
+                return None
+
+
+async def resolve_user_id(pool, semaphore, username, id_cache):
+    """Look up a player's userId in a fresh browser context and cache the outcome
+
+    Only browser work happens under the semaphore: the page is closed and
+    the slot released before the caller persists the result.
+    """
+    async with semaphore:
+        async with pool.page() as page:
+            try:
+                user_id = await find_user_id(page, username)
+
+                if user_id:
+                    id_cache.record_found(username, user_id)
+                    return user_id
+                else:
+                    id_cache.record_miss(username, "No userId found")
+                    print(f"  ❌ {username}: No userId found")
+                    return None
+            except Exception as e:
+                id_cache.record_error(username, str(e))
+                print(f"  ❌ {username}: Error - {str(e)[:50]}...")
+                return None
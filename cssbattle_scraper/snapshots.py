@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+import zlib
+
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", ".cache/profile_snapshots.jsonl.gz")
+# Snapshots kept per player when the store is compacted. flush() compacts
+# once a player has twice as many, so a rewrite happens every `keep`
+# changed visits per player rather than on every run
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+
+_META_KEYS = ("u", "t", "v")
+
+
+def _digest(snapshot, verdict):
+    content = {k: v for k, v in snapshot.items() if k not in _META_KEYS}
+    data = json.dumps([content, verdict], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+class SnapshotStore:
+    """Append-only, gzip-compressed store of extracted profile text
+
+    Each record is one JSON line: {"u": username, "t": capture time,
+    "v": verdict at capture, "exists", "panels", "main", "body"}. Every
+    flush appends a new gzip member to the file; gzip readers treat
+    concatenated members as one stream, so existing data is only rewritten
+    by compact().
+
+    A visit that read the same text with the same verdict as the player's
+    newest snapshot is not stored again, and flush() compacts the store
+    down to `keep` per player once a player has more than twice that, so
+    the file stays bounded by the number of players.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, keep=SNAPSHOT_KEEP):
+        self.path = path
+        self.keep = keep
+        self._pending = []
+        self._newest = None     # username -> digest of the newest record
+        self._counts = None     # username -> records stored or pending
+
+    def _load_index(self):
+        newest = {}
+        self._counts = {}
+        for record in self.records():
+            username = record.get("u")
+            self._counts[username] = self._counts.get(username, 0) + 1
+            current = newest.get(username)
+            if current is None or record.get("t", 0) >= current.get("t", 0):
+                newest[username] = record
+        self._newest = {u: _digest(r, r.get("v")) for u, r in newest.items()}
+
+    def append(self, username, snapshot, verdict, captured_at=None):
+        """Queue a snapshot; returns False if it repeats the newest one"""
+        if self._newest is None:
+            self._load_index()
+        digest = _digest(snapshot, verdict)
+        if self._newest.get(username) == digest:
+            return False
+        self._newest[username] = digest
+        self._counts[username] = self._counts.get(username, 0) + 1
+
+        record = {"u": username, "t": captured_at or int(time.time()), "v": verdict}
+        record.update(snapshot)
+        self._pending.append(record)
+        return True
+
+    def flush(self):
+        if not self._pending:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = "".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+                       for record in self._pending)
+        with open(self.path, "ab") as f:
+            f.write(gzip.compress(data.encode("utf-8")))
+        self._pending = []
+
+        if self.keep and any(count > 2 * self.keep for count in self._counts.values()):
+            self.compact(self.keep)
+
+    def records(self):
+        """Yield every stored record, oldest first"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except (EOFError, OSError, zlib.error):
+            # A run killed mid-flush leaves a truncated last member;
+            # everything before it is still readable
+            return
+
+    def latest(self):
+        """Return {username: newest record}"""
+        latest = {}
+        for record in self.records():
+            username = record.get("u")
+            current = latest.get(username)
+            # Later records win ties, so re-recorded verdicts take precedence
+            if current is None or record.get("t", 0) >= current.get("t", 0):
+                latest[username] = record
+        return latest
+
+    def compact(self, keep=1):
+        """Rewrite the store keeping only the newest `keep` records per username"""
+        by_user = {}
+        for record in self.records():
+            by_user.setdefault(record.get("u"), []).append(record)
+
+        kept = []
+        for records in by_user.values():
+            records.sort(key=lambda r: r.get("t", 0))
+            kept.extend(records[-keep:])
+        kept.sort(key=lambda r: r.get("t", 0))
+
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for record in kept:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+        if self._counts is not None:
+            self._counts = {u: min(count, keep) for u, count in self._counts.items()}
+        return len(kept)
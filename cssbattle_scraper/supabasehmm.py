@@ -0,0 +1,572 @@
+import httpx
+import asyncio
+import hashlib
+import json
+import os
+import time
+from .identity import PlayerIndex, parse_profile_link, profile_key, profile_link
+
+# Assuming the table name is "players" - you may need to change this
+TABLE_NAME = "players"  # Change this to your actual table name
+
+# Credentials are resolved on first use rather than at import, so the module
+# can be imported (and configured) by other services without a .env file
+_settings = None
+
+
+def configure(url=None, key=None):
+    """Set the Supabase URL and key explicitly instead of reading the environment"""
+    global _settings
+    _settings = None
+    if url is not None or key is not None:
+        _settings = _build_settings(url or os.getenv("SUPABASE_URL"),
+                                    key or os.getenv("SUPABASE_KEY"))
+
+
+def _build_settings(url, key):
+    headers = {
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
+        "Content-Type": "application/json"
+    }
+    return url, headers
+
+
+def get_settings():
+    """Return (SUPABASE_URL, HEADERS), loading the .env file on first call"""
+    global _settings
+    if _settings is None:
+        try:
+            from dotenv import load_dotenv
+            # Load environment variables from .env file
+            load_dotenv()
+        except ImportError:
+            pass
+        _settings = _build_settings(os.getenv("SUPABASE_URL"),
+                                    os.getenv("SUPABASE_KEY"))
+    return _settings
+
+
+# Shared client so connections stay pooled between requests (and between
+# cycles when running as a daemon)
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(20.0),
+            limits=httpx.Limits(max_connections=20,
+                                max_keepalive_connections=10)
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+# Set to False once a read shows the rank column hasn't been added yet
+# (see README); ranks are then kept in memory only
+_has_rank = None
+
+
+def has_rank_column():
+    """False if the players table has no rank column, None if not known yet"""
+    return _has_rank
+
+
+async def _fetch_rows(WithScore=False, params=None, extra_columns=(), WithRank=False):
+    """GET raw rows from the players table; None if the request failed"""
+    global _has_rank
+    supabase_url, headers = get_settings()
+    client = get_client()
+    # Correct the URL to include the table name
+    columns = "cssbattle_profile_link,verified_ofppt,api_user_css"
+
+    if WithScore:
+        columns += ",score"
+    select_rank = WithRank and _has_rank is not False
+    if select_rank:
+        columns += ",rank"
+    for column in extra_columns:
+        columns += f",{column}"
+
+    query = {"select": columns}
+    query.update(params or {})
+    r = await client.get(f"{supabase_url}/rest/v1/{TABLE_NAME}",
+                         headers=headers, params=query)
+
+    # Check if request was successful
+    if r.status_code != 200:
+        if select_rank and _has_rank is None and r.status_code == 400 and "rank" in r.text:
+            # The rank migration hasn't been run: read everything else
+            _has_rank = False
+            print("  [WARN] players.rank column is missing, ranks won't be stored (see README)")
+            return await _fetch_rows(WithScore, params, extra_columns, WithRank)
+        return None
+    if select_rank:
+        _has_rank = True
+
+    try:
+        links = r.json()
+    except Exception as e:
+        return None
+
+    # Handle case where response is an error object
+    if isinstance(links, dict) and 'error' in links:
+        return None
+
+    return links
+
+
+def _to_players(links, WithScore=False, WithRank=False):
+    usernames = []
+    for item in links:
+        if isinstance(item, dict):
+            # Fixed the URL replacement logic
+            raw_link = item.get('cssbattle_profile_link') or ''
+            # Tolerates http://, trailing slashes, query strings; "" if not a profile
+            username = parse_profile_link(raw_link) or ""
+            player = {
+                "username": username,
+                "cssbattle_profile": raw_link,  # Changed to match what the script expects
+                "verified_ofppt": item.get("verified_ofppt", False),
+                "api_user_css": item.get("api_user_css", None)
+            }
+            if WithScore:
+                player["score"] = item.get("score", 0)
+            if WithRank:
+                player["rank"] = item.get("rank", None)
+            usernames.append(player)
+    return usernames
+
+
+# Every raw link seen per canonical profile, so writes reach all of its rows
+_profile_links = {}
+
+
+def _build_index(links, WithScore=False, WithRank=False):
+    index = PlayerIndex(_to_players(links, WithScore, WithRank))
+    for player in index.players:
+        _profile_links.setdefault(profile_key(player['username']), set()).update(
+            player['links'])
+    return index
+
+
+def _links_filter(links):
+    """PostgREST filter matching rows whose link is one of links"""
+    links = sorted(links)
+    if len(links) == 1:
+        return {"cssbattle_profile_link": f"eq.{links[0]}"}
+    quoted = ",".join('"' + link.replace('\\', '\\\\').replace('"', '\\"') + '"'
+                      for link in links)
+    return {"cssbattle_profile_link": f"in.({quoted})"}
+
+
+def _row_filter(username):
+    """PostgREST filter matching every row that belongs to username's profile"""
+    return _links_filter(_profile_links.get(profile_key(username), ()) or [profile_link(username)])
+
+
+async def get_player_index(WithScore=False, WithRank=False):
+    """Read the table into a de-duplicated PlayerIndex (empty on failure)"""
+    links = await _fetch_rows(WithScore, WithRank=WithRank)
+    return _build_index(links or [], WithScore, WithRank)
+
+
+async def get_usernames(WithScore=False, WithRank=False):
+    """One entry per real profile; unparseable links are left out"""
+    index = await get_player_index(WithScore, WithRank)
+    return index.players
+
+
+async def get_api_candidates():
+    """Verified players without api_user_css, filtered by the database
+
+    Only the matching rows are transferred. Falls back to reading the
+    whole table if the filtered query fails.
+    """
+    links = await _fetch_rows(params={
+        "verified_ofppt": "eq.true",
+        "or": "(api_user_css.is.null,api_user_css.eq.)"
+    })
+    if links is None:
+        links = await _fetch_rows()
+    index = _build_index(links or [])
+    return [player for player in index.players
+            if player.get('verified_ofppt') and not player.get('api_user_css')]
+
+
+# ============================================================================
+# DELTA SYNC
+# ============================================================================
+
+# Column bumped on every insert/update (timestamp or sequence), see README
+WATERMARK_COLUMN = os.getenv("SYNC_WATERMARK_COLUMN", "updated_at")
+SYNC_STATE_PATH = os.getenv("SYNC_STATE_PATH", ".cache/sync_state.json")
+# A full read still happens periodically to catch deletes and stragglers
+FULL_SYNC_INTERVAL = float(os.getenv("SYNC_FULL_INTERVAL", str(6 * 60 * 60)))
+# Players that failed are re-read on this many following delta runs before
+# being left to the next full read
+MAX_RETRIES = int(os.getenv("SYNC_MAX_RETRIES", "5"))
+
+
+def _fingerprint(item):
+    return hashlib.sha1(json.dumps(item, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class SyncState:
+    """High-water mark of the last processed delta, persisted between runs
+
+    sync_players() only stages the new mark; call commit() once the rows
+    have been processed so a crashed run re-reads them next time. Players
+    passed to defer() before commit() are re-read by the next delta even
+    though the mark has moved past them.
+    """
+
+    def __init__(self, path=SYNC_STATE_PATH):
+        self.path = path
+        self.watermark = None
+        self.last_full_sync = 0
+        self.boundary = {}       # link -> fingerprint of rows at the watermark
+        self.retry = {}          # profile key -> {"links", "attempts"}
+        self.pending_watermark = None
+        self.pending_boundary = {}
+        self.pending_retry = {}
+        self.pending_full = False
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("column") == WATERMARK_COLUMN:
+                self.watermark = data.get("watermark")
+                self.last_full_sync = data.get("last_full_sync", 0)
+                self.boundary = data.get("boundary") or {}
+                self.retry = data.get("retry") or {}
+        except (OSError, ValueError, AttributeError):
+            pass
+        return self
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "column": WATERMARK_COLUMN,
+                "watermark": self.watermark,
+                "last_full_sync": self.last_full_sync,
+                "boundary": self.boundary,
+                "retry": self.retry
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def needs_full_sync(self):
+        return (self.watermark is None or
+                time.time() - self.last_full_sync >= FULL_SYNC_INTERVAL)
+
+    def unchanged(self, item):
+        """True for a row at the watermark that is as it was when processed"""
+        return (item.get(WATERMARK_COLUMN) == self.watermark and
+                self.boundary.get(item.get('cssbattle_profile_link')) == _fingerprint(item))
+
+    def retry_links(self):
+        return {link for entry in self.retry.values() for link in entry["links"]}
+
+    def defer(self, player):
+        """Re-read a player that failed on the next delta run"""
+        if not player:
+            return False
+        key = profile_key(player['username'])
+        attempts = self.retry.get(key, {}).get("attempts", 0) + 1
+        if attempts > MAX_RETRIES:
+            return False
+        self.pending_retry[key] = {"links": player.get('links') or [player['cssbattle_profile']],
+                                   "attempts": attempts}
+        return True
+
+    def commit(self):
+        if self.pending_watermark is not None:
+            self.watermark = self.pending_watermark
+            self.boundary = self.pending_boundary
+        self.retry = self.pending_retry
+        if self.pending_full:
+            self.last_full_sync = time.time()
+        self.pending_watermark = None
+        self.pending_boundary = {}
+        self.pending_retry = {}
+        self.pending_full = False
+
+
+async def sync_players(state, WithScore=False, force_full=False, WithRank=False):
+    """Fetch rows changed since the state's watermark
+
+    Returns (PlayerIndex, full). full is True when every row was read (first
+    run, periodic reconcile, or the delta query failed), in which case
+    rows missing from the result no longer exist.
+    """
+    full = force_full or state.needs_full_sync()
+    links = None
+    retry_rows = []
+    state.pending_retry = {}
+
+    if not full:
+        # gte rather than gt: rows sharing the boundary value are re-read
+        # instead of risking a skip
+        links = await _fetch_rows(WithScore, WithRank=WithRank, params={
+            WATERMARK_COLUMN: f"gte.{state.watermark}",
+            "order": f"{WATERMARK_COLUMN}.asc"
+        }, extra_columns=(WATERMARK_COLUMN,))
+        if links is None:
+            print(f"  [WARN] Delta sync on '{WATERMARK_COLUMN}' failed, doing a full read")
+            full = True
+        elif state.retry:
+            retry_rows = await _fetch_rows(WithScore, WithRank=WithRank,
+                                           params=_links_filter(state.retry_links()),
+                                           extra_columns=(WATERMARK_COLUMN,))
+            if retry_rows is None:
+                # Try them again on the next run
+                state.pending_retry = dict(state.retry)
+                retry_rows = []
+
+    if full:
+        links = await _fetch_rows(WithScore, WithRank=WithRank,
+                                  extra_columns=(WATERMARK_COLUMN,))
+        if links is None:
+            # Table may not have the watermark column yet
+            links = await _fetch_rows(WithScore, WithRank=WithRank)
+        if links is None:
+            # Not an empty table: callers must not treat this as "no players"
+            raise Exception("Could not read the players table")
+
+    links = [item for item in links if isinstance(item, dict)]
+    marks = [item.get(WATERMARK_COLUMN) for item in links
+             if item.get(WATERMARK_COLUMN) is not None]
+    state.pending_watermark = max(marks) if marks else None
+    # Remember the rows at the new mark so the next gte query can tell
+    # whether they were touched again
+    state.pending_boundary = {item.get('cssbattle_profile_link'): _fingerprint(item)
+                              for item in links
+                              if marks and item.get(WATERMARK_COLUMN) == state.pending_watermark}
+    state.pending_full = full
+
+    if not full:
+        # gte returns the rows at the old mark again; drop the ones that
+        # haven't changed since they were processed
+        links = [item for item in links if not state.unchanged(item)]
+        seen = {item.get('cssbattle_profile_link') for item in links}
+        links += [item for item in retry_rows if isinstance(item, dict)
+                  and item.get('cssbattle_profile_link') not in seen]
+    return _build_index(links, WithScore, WithRank), full
+
+
+async def update_fields(username, payload):
+    """PATCH several columns of a player's rows in one request"""
+    supabase_url, headers = get_settings()
+    # Fixed the URL - using proper Supabase REST API format
+    url = f"{supabase_url}/rest/v1/{TABLE_NAME}"
+
+    client = get_client()
+    r = await client.patch(url, headers=headers, params=_row_filter(username), json=payload)
+    if r.status_code in (200, 201, 204):
+        return {"username": username, **payload, "status": "updated"}
+    else:
+        try:
+            return r.json()
+        except:
+            return {"username": username, "status": "failed", "response": r.text}
+
+
+async def update_unverified_ofppt(username, is_verified):
+    return await update_fields(username, {"verified_ofppt": is_verified})
+
+
+async def update_score(username, score):
+    return await update_fields(username, {"score": score})
+
+
+async def update_api_user_css(username, api_endpoint):
+    return await update_fields(username, {"api_user_css": api_endpoint})
+
+
+async def update_rank(username, rank):
+    return await update_fields(username, {"rank": rank})
+
+
+# Seconds a change waits for other changes to the same player before the
+# coalescer sends it on its own
+COALESCE_WINDOW = float(os.getenv("SUPABASE_COALESCE_WINDOW", "0.5"))
+_COALESCED_FIELDS = ("verified_ofppt", "api_user_css", "score")
+
+
+class UpdateCoalescer:
+    """Merges field changes per player and sends one PATCH per player
+
+    update() queues changes and returns a future resolved with the PATCH
+    result. Pending changes are sent `window` seconds after the first one
+    was queued (never, if window is None) or when flush() is called at the
+    end of a stage. Values the row is known to hold already are dropped.
+    """
+
+    def __init__(self, window=COALESCE_WINDOW, concurrency=10):
+        self.window = window
+        # Shared by every flush, so overlapping timer flushes still send at
+        # most `concurrency` PATCHes at a time
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._pending = {}      # username -> {field: value}
+        self._waiters = {}      # username -> [futures]
+        self._known = {}        # username -> {field: value} as stored in the table
+        self._timer = None
+        self._flushes = set()
+        self.stats = {"changes": 0, "dropped": 0, "patches": 0, "failed": 0}
+
+    def remember(self, players):
+        """Record the stored values of freshly read rows"""
+        for player in players:
+            known = self._known.setdefault(player['username'], {})
+            for field in _COALESCED_FIELDS:
+                if field in player:
+                    known[field] = player[field]
+
+    def update(self, username, **fields):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.stats["changes"] += len(fields)
+
+        known = self._known.get(username, {})
+        merged = self._pending.get(username, {})
+        merged.update(fields)
+        # A later change can set a field back to its stored value
+        changes = {f: v for f, v in merged.items() if f not in known or known[f] != v}
+        self.stats["dropped"] += len(merged) - len(changes)
+
+        if not changes:
+            # Nothing left to write: the row already holds these values
+            self._pending.pop(username, None)
+            result = {"username": username, **fields, "status": "updated"}
+            for waiter in self._waiters.pop(username, []) + [future]:
+                if not waiter.done():
+                    waiter.set_result(result)
+            return future
+
+        self._pending[username] = changes
+        self._waiters.setdefault(username, []).append(future)
+        if self._timer is None and self.window is not None:
+            self._timer = loop.call_later(self.window, self._flush_soon)
+        return future
+
+    def _flush_soon(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        """Send every pending change; returns {username: result}"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, waiters = self._pending, self._waiters
+        self._pending, self._waiters = {}, {}
+        # Timer-started flushes still in flight must finish too, so every
+        # future queued before this call is resolved when it returns
+        in_flight = [t for t in self._flushes if t is not asyncio.current_task()]
+
+        async def send(username, payload):
+            async with self._semaphore:
+                try:
+                    result = await update_fields(username, payload)
+                except Exception as e:
+                    result = {"username": username, "status": "failed", "response": str(e)[:200]}
+            self.stats["patches"] += 1
+            if result.get("status") == "updated":
+                self._known.setdefault(username, {}).update(payload)
+            else:
+                self.stats["failed"] += 1
+            for waiter in waiters.get(username, []):
+                if not waiter.done():
+                    waiter.set_result(result)
+            return result
+
+        results = await asyncio.gather(*(send(u, p) for u, p in pending.items()))
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        return dict(zip(pending, results))
+
+    async def close(self):
+        await self.flush()
+
+
+async def update_ranks(ranks):
+    """Write many ranks at once through the set_player_ranks RPC (see README)
+
+    Falls back to one PATCH per row if the function is not installed.
+    Returns {"status", "updated": [usernames], "failed": [usernames]}.
+    """
+    if not ranks:
+        return {"status": "updated", "updated": [], "failed": []}
+    if _has_rank is False:
+        return {"status": "failed", "updated": [], "failed": list(ranks),
+                "response": "players.rank column is missing"}
+
+    supabase_url, headers = get_settings()
+    client = get_client()
+    updates = [{"cssbattle_profile_link": link, "rank": rank}
+               for username, rank in ranks.items()
+               for link in (_profile_links.get(profile_key(username)) or [profile_link(username)])]
+    r = await client.post(f"{supabase_url}/rest/v1/rpc/set_player_ranks",
+                          headers=headers, json={"updates": updates})
+    if r.status_code in (200, 201, 204):
+        return {"status": "updated", "updated": list(ranks), "failed": []}
+
+    if r.status_code != 404:
+        return {"status": "failed", "updated": [], "failed": list(ranks),
+                "response": r.text}
+
+    # RPC missing: one PATCH per row, a few at a time
+    semaphore = asyncio.Semaphore(10)
+
+    async def write(username, rank):
+        async with semaphore:
+            return await update_rank(username, rank)
+
+    results = await asyncio.gather(*[write(u, rank) for u, rank in ranks.items()],
+                                   return_exceptions=True)
+    updated = [u for u, result in zip(ranks, results)
+               if isinstance(result, dict) and result.get("status") == "updated"]
+    written = set(updated)
+    failed = [u for u in ranks if u not in written]
+    return {"status": "updated" if not failed else "partial",
+            "updated": updated, "failed": failed}
+
+
+async def fetch_score(api_endpoint):
+    """Fetch a player's current score from their getRank API endpoint"""
+    client = get_client()
+    try:
+        r = await client.get(api_endpoint)
+    except httpx.HTTPError:
+        return None
+
+    if r.status_code != 200:
+        return None
+
+    try:
+        data = r.json()
+    except Exception:
+        return None
+
+    if isinstance(data, dict) and data.get("score") is not None:
+        try:
+            return float(data["score"])
+        except (TypeError, ValueError):
+            return None
+    return None
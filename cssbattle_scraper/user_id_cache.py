@@ -0,0 +1,143 @@
+import json
+import os
+import time
+
+
+# Where the username -> userId map is kept between runs
+CACHE_PATH = os.getenv("USER_ID_CACHE_PATH", ".cache/user_ids.json")
+
+# Negative entries back off exponentially: 15 min, 30 min, 1 h, ... up to 7 days
+BASE_BACKOFF_SECONDS = 15 * 60
+MAX_BACKOFF_SECONDS = 7 * 24 * 60 * 60
+
+# After this many misses in a row the lookup is considered hopeless: it is
+# only retried at the maximum backoff and listed in step 5. Navigation
+# errors and timeouts back off too but never make a lookup hopeless.
+HOPELESS_AFTER = 6
+
+API_ENDPOINT_PREFIX = "https://us-central1-cssbattleapp.cloudfunctions.net/getRank?userId="
+
+
+def user_id_from_url(url):
+    """Extract the userId query parameter from a getRank URL"""
+    if not url or 'userId=' not in url:
+        return None
+    start = url.find('userId=') + 7
+    end = url.find('&', start)
+    if end == -1:
+        end = len(url)
+    return url[start:end] or None
+
+
+def api_endpoint_for(user_id):
+    """Build the getRank API endpoint stored in api_user_css"""
+    return f"{API_ENDPOINT_PREFIX}{user_id}"
+
+
+class UserIdCache:
+    """Persistent username -> userId map with negative caching"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.entries = data
+        except (OSError, ValueError):
+            # Missing or corrupt cache - start empty, it will be rebuilt
+            self.entries = {}
+        return self
+
+    def save(self):
+        if not self.dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temp file first so a crash never leaves a half-written cache
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def get(self, username):
+        """Return the cached userId for a username, or None"""
+        entry = self.entries.get(username)
+        if entry:
+            return entry.get("user_id")
+        return None
+
+    def record_found(self, username, user_id):
+        """Record a resolved userId, clearing any negative entry"""
+        if not username or not user_id:
+            return
+        entry = self.entries.get(username)
+        if entry and entry.get("user_id") == user_id:
+            return
+        self.entries[username] = {
+            "user_id": user_id,
+            "resolved_at": int(time.time())
+        }
+        self.dirty = True
+
+    def record_miss(self, username, reason=""):
+        """Record a failed lookup and push the next attempt back"""
+        if not username:
+            return
+        entry = self.entries.get(username) or {}
+        if entry.get("user_id"):
+            # A previously resolved id is still good, a single miss doesn't undo it
+            return
+        failures = entry.get("failures", 0) + 1
+        backoff = min(BASE_BACKOFF_SECONDS * (2 ** (failures - 1)),
+                      MAX_BACKOFF_SECONDS)
+        if failures >= HOPELESS_AFTER:
+            backoff = MAX_BACKOFF_SECONDS
+        self._schedule_retry(username, failures, 0, backoff, reason)
+
+    def record_error(self, username, reason=""):
+        """Record a lookup that failed before the profile could be read
+
+        Backs off like a miss, on its own counter, so transient navigation
+        errors never make a player hopeless.
+        """
+        if not username:
+            return
+        entry = self.entries.get(username) or {}
+        if entry.get("user_id"):
+            return
+        errors = entry.get("errors", 0) + 1
+        backoff = min(BASE_BACKOFF_SECONDS * (2 ** (errors - 1)),
+                      MAX_BACKOFF_SECONDS)
+        self._schedule_retry(username, entry.get("failures", 0), errors, backoff, reason)
+
+    def _schedule_retry(self, username, failures, errors, backoff, reason):
+        now = int(time.time())
+        self.entries[username] = {
+            "failures": failures,
+            "errors": errors,
+            "last_attempt": now,
+            "retry_after": now + backoff,
+            "reason": reason[:100]
+        }
+        self.dirty = True
+
+    def should_lookup(self, username):
+        """True if the browser should be used to look this username up"""
+        entry = self.entries.get(username)
+        if not entry:
+            return True
+        if entry.get("user_id"):
+            return False
+        return time.time() >= entry.get("retry_after", 0)
+
+    def is_hopeless(self, username):
+        """True after HOPELESS_AFTER misses in a row with no userId found"""
+        entry = self.entries.get(username)
+        return bool(entry) and entry.get("failures", 0) >= HOPELESS_AFTER